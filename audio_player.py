@@ -4,222 +4,952 @@ Simple Python Audio Player
 Plays audio files from a file or directory path with looping support.
 """
 
-import argparse
 import os
 import sys
-import pygame
 import time
-import subprocess
-import json
+import struct
 import threading
+import queue
+from itertools import chain, groupby, islice
 from shutil import which
-from collections import Counter
 from datetime import datetime
+from functools import lru_cache
+from operator import attrgetter, itemgetter
+
+# pygame is imported by AudioPlayer.__init__: loading SDL is slow and not needed
+# for --help or argument errors. subprocess, tempfile, json and concurrent.futures
+# are likewise imported where they are used, since each run needs only some of them.
+pygame = None
+
+# Separator line that starts each run's section of the play log.
+_SEP = ("=" * 60 + "\n").encode('utf-8')
 
 
 class AudioPlayer:
     """Simple audio player class for playing audio files."""
 
-    def __init__(self, log_file: str = 'play_log.txt'):
+    # Formats pygame.mixer.Sound can decode, and the most decoded audio we preload into memory.
+    _PRELOAD_FORMATS = frozenset(('.wav', '.ogg', '.flac'))
+    _PRELOAD_MAX_BYTES = 50 * 1024 * 1024
+    # How far ahead of the header durations a clean ffplay exit may come and
+    # still count as having played the rest of a concat list.
+    _QUEUE_END_TOLERANCE_S = 0.5
+    # Most .m4a files handed to one concat run, so the first one starts without
+    # waiting for the rest of the tree to be walked and its headers read.
+    _QUEUE_MAX_FILES = 16
+
+    # How often scheduled playback re-checks for a file that isn't there yet.
+    _SCHEDULE_RETRY_S = 5.0
+
+    # Directory nesting below which the library scan stops descending.
+    _MAX_SCAN_DEPTH = 64
+
+    # Per-directory sort order: case-insensitive on Windows, byte order elsewhere,
+    # where normcase() is the identity and calling it per entry is wasted work.
+    if os.name == 'nt':
+        _scan_sort_key = staticmethod(lambda e: os.path.normcase(e.name))
+    else:
+        _scan_sort_key = attrgetter('name')
+
+    def __init__(self, log_file: str = 'play_log.txt', mixer_freq: int = 44100, mixer_buffer: int = 1024):
         """Initialize the audio player."""
+        global pygame
+        import pygame
+        # Open the device at the source rate (CD rate by default) so files skip
+        # SDL_mixer's resampler, with a 1024-sample buffer for prompt track ends.
+        # These only apply on init; changing them later needs mixer.quit() + init().
+        pygame.mixer.pre_init(frequency=mixer_freq, size=-16, channels=2, buffer=mixer_buffer)
         pygame.mixer.init()
         # Note: .m4a support via pygame depends on SDL_mixer codec support.
         # This script includes a best-effort Windows-friendly fallback for .m4a using ffplay (ffmpeg).
         self.supported_formats = ('.mp3', '.wav', '.ogg', '.flac', '.m4a')
+        self._ext_set = frozenset(self.supported_formats)
+        self._ext_set_bytes = frozenset(os.fsencode(ext) for ext in self.supported_formats)
 
         self.log_file = log_file
-        self.play_counts = Counter()
+        self.play_counts = {}
+        self._abs_cache = {}
         self.run_started_at = datetime.now()
-        self.stop_flag = False
-        self.playback_thread = None
+        self._stop_event = threading.Event()
         self._ffplay_proc = None
+        # Resolved once: which() stats every PATH entry, and the m4a loops would
+        # otherwise repeat that per iteration. None when ffplay isn't installed.
+        self._ffplay_path = which('ffplay')
+        self._preloads = {}
         
         self._run_log_header_written = False
+        self._log_fd = None
+        self._ts_second = None
+        self._ts_text = ''
+        # Log lines are written by a background thread so a slow disk never
+        # stalls playback; None on the queue tells the writer to finish.
+        self._log_queue = queue.Queue(maxsize=1024)
+        self._log_writer = threading.Thread(target=self._log_writer_loop, daemon=True)
+        self._log_writer.start()
+
+        # Ask SDL_mixer to post an event when music ends so we can block on the
+        # event queue instead of polling get_busy(). The event queue needs the
+        # video subsystem, but no window: without a display (headless hosts,
+        # and macOS, where Cocoa would put a Dock icon up) SDL's dummy driver
+        # provides it. Polling is the last resort.
+        self._music_end_event = None
+        self._wake_event = None
+        if 'SDL_VIDEODRIVER' not in os.environ and (
+            sys.platform == 'darwin'
+            or (os.name == 'posix' and not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY'))
+        ):
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        try:
+            try:
+                pygame.display.init()
+            except pygame.error:
+                if os.environ.get('SDL_VIDEODRIVER') == 'dummy':
+                    raise
+                os.environ['SDL_VIDEODRIVER'] = 'dummy'
+                pygame.display.init()
+            self._music_end_event = pygame.USEREVENT + 1
+            pygame.mixer.music.set_endevent(self._music_end_event)
+            # Posted by _request_stop() so a stop_flag set from another thread wakes
+            # the wait loop at once instead of at its next timeout.
+            self._wake_event = pygame.USEREVENT + 2
+            # Only queue our own events so unrelated SDL events (audio device,
+            # display, ...) never wake the playback wait loop.
+            pygame.event.set_blocked(None)
+            pygame.event.set_allowed([self._music_end_event, self._wake_event])
+        except pygame.error as e:
+            self._music_end_event = self._wake_event = None
+            print(f"Warning: no SDL event queue ({e}); checking for track ends every 100 ms instead")
+
+    def _request_stop(self) -> None:
+        """Set the stop event, silence every player and wake a blocked pygame wait."""
+        self._stop_event.set()
+        self._stop_external_players()
+        try:
+            pygame.mixer.music.stop()
+            pygame.mixer.stop()
+        except pygame.error:
+            pass
+        if self._wake_event is not None:
+            try:
+                pygame.event.post(pygame.event.Event(self._wake_event))
+            except pygame.error:
+                pass
+
+    @property
+    def stop_flag(self) -> bool:
+        """Whether playback has been asked to stop (backed by a threading.Event).
+
+        The command line never sets this; it is for code that embeds
+        AudioPlayer and runs play() or play_scheduled() on a worker thread.
+        Setting it to True from another thread ends the current playback: a
+        play() call returns, and play_scheduled() ends the current window and
+        goes on to the next one. Both clear it again when they start.
+        """
+        return self._stop_event.is_set()
+
+    @stop_flag.setter
+    def stop_flag(self, value: bool) -> None:
+        if value:
+            self._request_stop()
+        else:
+            self._stop_event.clear()
 
     def is_audio_file(self, filepath):
         """Check if a file is a supported audio format."""
-        return filepath.lower().endswith(self.supported_formats)
+        # Slice from the last dot and lowercase only that: one set lookup instead
+        # of an endswith() scan over every format. A dot in a directory name
+        # leaves a separator in the slice, which never matches an extension.
+        dot = filepath.rfind('.')
+        if dot < 0:
+            return False
+        return filepath[dot:].lower() in self._ext_set
+
+    @staticmethod
+    def _extension(filepath):
+        """Return the lowercased extension of `filepath` (with the dot), or ''."""
+        dot = filepath.rfind('.')
+        return filepath[dot:].lower() if dot >= 0 else ''
     
+    def _scan_directory(self, directory):
+        """List one directory: return `(records, subdirs)`, both in sorted order.
+
+        Returns None if the directory can't be read (skipped, as os.walk did).
+        `directory` may be bytes (see `_iter_audio`); record paths are always str.
+        """
+        as_bytes = isinstance(directory, bytes)
+        ext_set = self._ext_set_bytes if as_bytes else self._ext_set
+        dot, m4a = (b'.', b'.m4a') if as_bytes else ('.', '.m4a')
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=self._scan_sort_key)
+        except OSError:
+            return None
+
+        records = []
+        subdirs = []
+        for entry in entries:
+            # DirEntry caches the type from readdir, so this costs no extra stat().
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            else:
+                # Lowercase just the basename's extension, once per file.
+                name = entry.name
+                ext = name[name.rfind(dot):].lower()
+                if ext in ext_set:
+                    records.append((os.fsdecode(entry.path), True if ext == m4a else None))
+        return records, subdirs
+
+    def _iter_audio(self, path):
+        """Yield `(path, is_m4a)` records for audio files under a directory.
+
+        `is_m4a` is True for .m4a files and None for the rest, meaning only the
+        extension was checked; `play_file` sniffs those before choosing a player.
+
+        Traversal is depth-first with entries sorted per directory. Subdirectory
+        listings are fetched ahead on a thread pool, which hides most of the
+        readdir latency on network shares while keeping the output order.
+        """
+        # On POSIX, walk with bytes paths so the OS calls skip re-encoding every
+        # path; only matching files are decoded back to str for the player.
+        if os.name == 'posix':
+            path = os.fsencode(path)
+        listing = self._scan_directory(path)
+        if listing is None:
+            return
+        records, subdirs = listing
+        if not subdirs:
+            # Flat folder (the common case): one listing, no pool to start.
+            yield from records
+            return
+
+        from concurrent.futures import ThreadPoolExecutor
+        workers = min(32, (os.cpu_count() or 1) * 4)
+        pool = ThreadPoolExecutor(max_workers=workers)
+        # Stack of (future, depth); symlinked directories are never followed,
+        # the depth cap only guards against pathological trees.
+        stack = [(pool.submit(self._scan_directory, d), 1) for d in reversed(subdirs)]
+        try:
+            yield from records
+            while stack:
+                future, depth = stack.pop()
+                listing = future.result()
+                if listing is None:
+                    continue
+                records, subdirs = listing
+                if depth < self._MAX_SCAN_DEPTH:
+                    stack.extend(
+                        (pool.submit(self._scan_directory, d), depth + 1)
+                        for d in reversed(subdirs)
+                    )
+                yield from records
+        finally:
+            for future, _ in stack:
+                future.cancel()
+            pool.shutdown(wait=False)
+
     def get_audio_files(self, path):
-        """Get list of audio files from a file or directory path."""
+        """Get `(path, is_m4a)` records for audio files from a file or directory path."""
         audio_files = []
         
         if os.path.isfile(path):
             if self.is_audio_file(path):
-                audio_files.append(path)
+                audio_files.append((path, True if self._extension(path) == '.m4a' else None))
             else:
                 print(f"Error: {path} is not a supported audio format.")
                 print(f"Supported formats: {', '.join(self.supported_formats)}")
         elif os.path.isdir(path):
-            for root, dirs, files in os.walk(path):
-                for file in sorted(files):
-                    filepath = os.path.join(root, file)
-                    if self.is_audio_file(filepath):
-                        audio_files.append(filepath)
+            audio_files.extend(self._iter_audio(path))
         else:
             print(f"Error: {path} does not exist.")
         
         return audio_files
 
-    def _play_with_ffplay(self, filepath: str, loop: bool = False) -> bool:
-        """Play an audio file using ffplay (part of FFmpeg). Returns True if started successfully."""
-        ffplay = which('ffplay')
-        if not ffplay:
-            return False
+    @staticmethod
+    def _watch_process(proc) -> threading.Event:
+        """Return an Event that is set once `proc` exits.
 
-        # -nodisp: no window, -autoexit: quit when done, -loglevel error: keep output clean
-        args = [ffplay, '-nodisp', '-autoexit', '-loglevel', 'error']
-        if loop:
-            # ffplay loops with -loop 0 (infinite)
-            args += ['-loop', '0']
-        args += [filepath]
+        Popen.wait() with a timeout polls waitpid() every few milliseconds on
+        POSIX; a thread blocked in a plain wait() lets callers sleep on the
+        Event until the process ends or their own timeout, with no wakeups.
+        """
+        exited = threading.Event()
 
-        try:
-            subprocess.run(args, check=True)
-            return True
-        except Exception:
-            return False
+        def wait():
+            proc.wait()
+            exited.set()
+
+        threading.Thread(target=wait, daemon=True).start()
+        return exited
+
+    def _play_with_ffplay(self, filepath: str, deadline: float = None) -> bool:
+        """Play an audio file using ffplay (part of FFmpeg) as a subprocess we can terminate.
 
-    def _play_with_ffplay_process(self, filepath: str) -> bool:
-        """Play a single file using ffplay as a subprocess we can terminate."""
-        ffplay = which('ffplay')
+        With `deadline` (a time.time() value), ffplay is terminated when it is
+        reached. Returns True if ffplay finished cleanly or was stopped; callers
+        check _stopped() before counting the file as played.
+        """
+        ffplay = self._ffplay_path
         if not ffplay:
             return False
+        import subprocess
 
+        # -nodisp: no window, -autoexit: quit when done, -loglevel error: keep output clean
         args = [ffplay, '-nodisp', '-autoexit', '-loglevel', 'error', filepath]
+
         try:
-            self._ffplay_proc = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            # Wait until it exits OR stop_flag becomes True
-            while True:
-                if self.stop_flag:
-                    try:
-                        self._ffplay_proc.terminate()
-                    except Exception:
-                        pass
-                    return True
-                rc = self._ffplay_proc.poll()
-                if rc is not None:
-                    return rc == 0
-                time.sleep(0.1)
-        except Exception:
+            proc = subprocess.Popen(
+                args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+        except OSError:
             return False
+
+        self._ffplay_proc = proc
+        try:
+            # stop_flag terminates the process (_request_stop -> _stop_external_players),
+            # so a blocking wait() returns as soon as ffplay ends either way. The
+            # check covers a stop that landed before _ffplay_proc was set.
+            if self._stop_event.is_set():
+                proc.terminate()
+            if deadline is None:
+                rc = proc.wait()
+            else:
+                if not self._watch_process(proc).wait(max(0.0, deadline - time.time())):
+                    proc.terminate()
+                rc = proc.wait()
+        except KeyboardInterrupt:
+            proc.terminate()
+            try:
+                proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            raise
         finally:
             self._ffplay_proc = None
+        return self._stopped(deadline) or rc == 0
 
-    def _normalize_log_path(self, filepath: str) -> str:
+    @staticmethod
+    def _sniff_format(filepath: str):
+        """Identify an audio file from its first bytes.
+
+        Returns 'm4a', 'wav', 'flac', 'ogg', 'mp3' or None. Results are cached
+        per (path, mtime, size), so a file is only read again after it changes.
+        """
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        return AudioPlayer._sniff_header(filepath, st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _sniff_sample_rate(filepath: str):
+        """Return the sample rate of a WAV or FLAC file from its header, or None."""
+        try:
+            with open(filepath, 'rb') as f:
+                head = f.read(28)
+        except OSError:
+            return None
+        if len(head) < 28:
+            return None
+        if head[:4] == b'RIFF' and head[8:16] == b'WAVEfmt ':
+            return struct.unpack_from('<I', head, 24)[0] or None
+        if head[:4] == b'fLaC' and head[4] & 0x7F == 0:
+            # STREAMINFO: 20-bit sample rate after the 10 bytes of block/frame sizes.
+            return (head[18] << 12 | head[19] << 4 | head[20] >> 4) or None
+        return None
+
+    @staticmethod
+    def _sniff_duration(filepath: str):
+        """Return the length in seconds of a WAV, FLAC or Ogg file from its headers, or None."""
+        try:
+            with open(filepath, 'rb') as f:
+                head = f.read(44)
+                size = os.fstat(f.fileno()).st_size
+                if head[:4] == b'OggS':
+                    # The last page's granule position is the stream length in samples.
+                    f.seek(max(0, size - 65536))
+                    tail = f.read()
+        except OSError:
+            return None
+        if len(head) < 44:
+            return None
+        if head[:4] == b'RIFF' and head[8:16] == b'WAVEfmt ':
+            byte_rate = struct.unpack_from('<I', head, 28)[0]
+            return size / byte_rate if byte_rate else None
+        if head[:4] == b'fLaC' and head[4] & 0x7F == 0:
+            rate = head[18] << 12 | head[19] << 4 | head[20] >> 4
+            samples = (head[21] & 0x0F) << 32 | struct.unpack_from('>I', head, 22)[0]
+            return samples / rate if rate and samples else None
+        if head[:4] == b'OggS':
+            if head[28:35] == b'\x01vorbis':
+                rate = struct.unpack_from('<I', head, 40)[0]
+            elif head[28:36] == b'OpusHead':
+                rate = 48000
+            else:
+                return None
+            page = tail.rfind(b'OggS')
+            if page < 0 or page + 14 > len(tail) or not rate:
+                return None
+            granule = struct.unpack_from('<q', tail, page + 6)[0]
+            return granule / rate if granule > 0 else None
+        return None
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _sniff_header(filepath: str, mtime_ns: int, size: int):
+        try:
+            with open(filepath, 'rb') as f:
+                head = f.read(16)
+        except OSError:
+            return None
+        if head[4:8] == b'ftyp':
+            return 'm4a'
+        if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+            return 'wav'
+        if head[:4] == b'fLaC':
+            return 'flac'
+        if head[:4] == b'OggS':
+            return 'ogg'
+        # ID3 tag, or an MPEG audio Layer III frame sync (excludes AAC ADTS).
+        if head[:3] == b'ID3' or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE6 == 0xE2):
+            return 'mp3'
+        return None
+
+    @staticmethod
+    def _m4a_info(filepath: str):
+        """Return `(duration, stream)` for an MP4/M4A file from its 'moov' box.
+
+        `duration` is in seconds from 'mvhd'; `stream` is `(codec, channels,
+        sample_size, sample_rate)` from the first 'stsd' sample entry. Files
+        can only share one concat run when their streams match. Either value is
+        None if unknown. Cached per (path, mtime, size) like _sniff_format().
+        """
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None, None
+        return AudioPlayer._read_m4a_info(filepath, st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _read_m4a_info(filepath: str, mtime_ns: int, size: int):
+        duration = stream = None
+        try:
+            with open(filepath, 'rb') as f:
+                limit = size
+                pos = 0
+                while pos + 8 <= limit and (duration is None or stream is None):
+                    f.seek(pos)
+                    box_size, kind = struct.unpack('>I4s', f.read(8))
+                    header = 8
+                    if box_size == 1:
+                        box_size = struct.unpack('>Q', f.read(8))[0]
+                        header = 16
+                    elif box_size == 0:
+                        box_size = limit - pos
+                    if box_size < header:
+                        break
+                    if kind in (b'moov', b'trak', b'mdia', b'minf', b'stbl'):
+                        # Descend; mvhd sits in moov, stsd at the bottom of the track.
+                        limit = pos + box_size
+                        pos += header
+                        continue
+                    if kind == b'mvhd' and duration is None:
+                        version = f.read(4)[0]
+                        if version == 1:
+                            _, _, timescale, length = struct.unpack('>QQIQ', f.read(28))
+                        else:
+                            _, _, timescale, length = struct.unpack('>IIII', f.read(16))
+                        duration = length / timescale if timescale else None
+                    elif kind == b'stsd' and stream is None:
+                        # Skip version/flags, entry count, then the first entry's size.
+                        f.seek(pos + header + 12)
+                        codec = f.read(4)
+                        # Reserved and data reference index, then the version, revision
+                        # and vendor fields of the audio sample entry.
+                        f.seek(16, os.SEEK_CUR)
+                        channels, sample_size, _, _, rate = struct.unpack('>HHHHI', f.read(12))
+                        stream = (codec, channels, sample_size, rate >> 16)
+                    pos += box_size
+        except (OSError, struct.error, IndexError):
+            pass
+        return duration, stream
+
+    def _play_queue_with_ffplay(self, filepaths: list, loop: bool = False, deadline: float = None) -> list:
+        """Play several files through a single ffplay process using the concat demuxer.
+
+        Spawning ffplay per file is slow on some systems, so a run of files is
+        handed to one process. Per-file log events are driven by the durations
+        read from each file's header. Returns the files that were not played so
+        the caller can fall back to playing them one by one. With `loop`, the
+        same process replays the list until it fails or is interrupted. With
+        `deadline` (a time.time() value), ffplay is terminated when it is reached;
+        a file cut off by it is not counted as played.
+        """
+        ffplay = self._ffplay_path
+        if not ffplay:
+            return filepaths
+        durations, streams = zip(*map(self._m4a_info, filepaths))
+        # The concat demuxer needs every file to carry the same stream layout.
+        if None in durations or streams[0] is None or streams.count(streams[0]) != len(streams):
+            return filepaths
+        import subprocess
+        import tempfile
+
+        fd, list_path = tempfile.mkstemp(prefix='ffplay_queue_', suffix='.txt')
         try:
-            return os.path.abspath(filepath)
-        except Exception:
-            return filepath
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for filepath in filepaths:
+                    escaped = os.path.abspath(filepath).replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\n")
+
+            args = [ffplay, '-nodisp', '-autoexit', '-loglevel', 'error']
+            if loop:
+                args += ['-loop', '0']
+            args += ['-f', 'concat', '-safe', '0', '-i', list_path]
+            try:
+                self._ffplay_proc = subprocess.Popen(
+                    args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                )
+            except OSError:
+                return filepaths
+
+            proc = self._ffplay_proc
+            if self._stop_event.is_set():
+                # stop_flag was set before _ffplay_proc was, so nothing ended it.
+                proc.terminate()
+            exited = self._watch_process(proc)
+            plays = [0] * len(filepaths)
+            try:
+                file_end = time.monotonic()
+                stop_at = None if deadline is None else file_end + (deadline - time.time())
+                begun = False
+                first_pass = True
+                while True:
+                    for i, (filepath, duration) in enumerate(zip(filepaths, durations)):
+                        if first_pass:
+                            # Once per file; a looping list would flood the console.
+                            print(f"Playing: {filepath}")
+                        if not begun:
+                            self._append_play_begin(filepath)
+                        file_end += duration
+                        wake = file_end if stop_at is None else min(file_end, stop_at)
+                        if not exited.wait(max(0.0, wake - time.monotonic())):
+                            if wake < file_end:
+                                # The window ended mid-file.
+                                proc.terminate()
+                                proc.wait()
+                                return []
+                            # Still running past this file's end: it has been played
+                            # and the next one has begun, logged in one write.
+                            if i + 1 < len(filepaths):
+                                next_filepath = filepaths[i + 1]
+                            else:
+                                next_filepath = filepaths[0] if loop else None
+                            self._log_play_success(filepath, next_filepath, count=False)
+                            plays[i] += 1
+                            begun = next_filepath is not None
+                            continue
+
+                        rc = proc.wait()
+                        if rc != 0:
+                            if self._stop_event.is_set():
+                                # Terminated through stop_flag, not a playback failure.
+                                return []
+                            self._append_play_fail(filepath, f"ffplay_exit:{rc}")
+                            return filepaths[i + 1:]
+                        list_end = file_end + sum(durations[i + 1:])
+                        if time.monotonic() < list_end - self._QUEUE_END_TOLERANCE_S:
+                            # A clean exit well before the list should have ended:
+                            # the concat demuxer gave up on a file. Let the caller
+                            # play the rest one by one.
+                            self._append_play_fail(filepath, "ffplay_exited_early")
+                            return filepaths[i + 1:]
+                        # ffplay reached the end of the list slightly ahead of our clock.
+                        lines = []
+                        ts = self._fmt_ts()
+                        for j in range(i, len(filepaths)):
+                            if j > i:
+                                lines.append(self._play_line("PLAY_BEGIN", filepaths[j], ts))
+                            plays[j] += 1
+                            lines.append(self._play_line("PLAY", filepaths[j], ts))
+                        self._append_log_lines(lines)
+                        return []
+
+                    if not loop:
+                        proc.wait()
+                        return []
+                    first_pass = False
+            except BaseException:
+                proc.terminate()
+                raise
+            finally:
+                self._ffplay_proc = None
+                # Per-file tallies are added once, when the process is done.
+                for filepath, n in zip(filepaths, plays):
+                    if n:
+                        self._increment_play_count(filepath, n)
+        finally:
+            try:
+                os.remove(list_path)
+            except OSError:
+                pass
 
-    def _increment_play_count(self, filepath: str) -> None:
-        self.play_counts[self._normalize_log_path(filepath)] += 1
+    def _normalize_log_path(self, filepath: str) -> str:
+        # Memoized: the same few paths are logged over and over while looping.
+        # A plain get() rather than setdefault(), which would run abspath()
+        # (a getcwd() call) on every hit. Values are interned once here, as
+        # they also key play_counts.
+        normalized = self._abs_cache.get(filepath)
+        if normalized is None:
+            normalized = self._abs_cache[filepath] = sys.intern(os.path.abspath(filepath))
+        return normalized
+
+    def _increment_play_count(self, filepath: str, n: int = 1) -> None:
+        key = self._normalize_log_path(filepath)
+        counts = self.play_counts
+        counts[key] = counts.get(key, 0) + n
+
+    def _get_log_fd(self) -> int:
+        """Return the play log's file descriptor, opening it for appending on first use.
+
+        The descriptor stays open for the whole run and is closed by `close()`.
+        Writes go straight to os.write() (no io buffering), so every batch from
+        the writer thread reaches the file immediately.
+        """
+        if self._log_fd is None:
+            self._log_fd = os.open(self.log_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._log_fd
 
-    def _write_run_log_header_if_needed(self) -> None:
-        if self._run_log_header_written:
+    def _write_log_bytes(self, data: bytes) -> None:
+        try:
+            fd = self._get_log_fd()
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        except Exception as e:
+            print(f"Warning: failed to write to play log '{self.log_file}': {e}")
+
+    def _log_writer_loop(self) -> None:
+        """Background writer: drain queued log entries and write them in batches."""
+        done = False
+        while not done:
+            batch = [self._log_queue.get()]
+            while len(batch) < 256:
+                try:
+                    batch.append(self._log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                batch = batch[:batch.index(None)]
+                done = True
+            if batch:
+                self._write_log_bytes(b"".join(batch))
+
+    def _queue_log_bytes(self, data: bytes) -> None:
+        if self._log_writer is None:
+            # Writer already stopped (a line logged after write_run_log()).
+            self._write_log_bytes(data)
             return
         try:
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                f.write("=" * 60 + "\n")
-                f.write(f"Run start: {self.run_started_at.isoformat(sep=' ', timespec='seconds')}\n")
+            self._log_queue.put_nowait(data)
+        except queue.Full:
+            # The disk is far behind; wait for room rather than writing out of order.
+            self._log_queue.put(data)
+
+    def _stop_log_writer(self) -> None:
+        """Flush queued log lines and stop the writer thread."""
+        if self._log_writer is None:
+            return
+        self._log_queue.put(None)
+        self._log_writer.join()
+        self._log_writer = None
+
+    def _queue_log_entry(self, text: str) -> None:
+        """Queue `text` for the play log, preceded by the run header the first time."""
+        # surrogateescape writes undecodable file names back as their original bytes.
+        data = text.encode('utf-8', 'surrogateescape')
+        if not self._run_log_header_written:
+            # Header and first entry go out as one write.
+            started = self.run_started_at.isoformat(sep=' ', timespec='seconds')
+            data = _SEP + f"Run start: {started}\n".encode('utf-8') + data
             self._run_log_header_written = True
-        except Exception as e:
-            print(f"Warning: failed to write play log header '{self.log_file}': {e}")
+        self._queue_log_bytes(data)
 
     def _append_log_line(self, line: str) -> None:
-        self._write_run_log_header_if_needed()
-        try:
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                f.write(line + "\n")
-        except Exception as e:
-            print(f"Warning: failed to write to play log '{self.log_file}': {e}")
+        self._queue_log_entry(line + "\n")
+
+    def _append_log_lines(self, lines) -> None:
+        """Append several lines as one log entry (a single write)."""
+        self._queue_log_entry("\n".join(lines) + "\n")
+
+    def _fmt_ts(self) -> str:
+        """Current local time as 'YYYY-MM-DD HH:MM:SS', formatted at most once per second."""
+        now = int(time.time())
+        if now != self._ts_second:
+            self._ts_text = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
+            self._ts_second = now
+        return self._ts_text
+
+    def _play_line(self, kind: str, filepath: str, ts: str = None) -> str:
+        """Format a PLAY_* line; lines written together pass one shared `ts`."""
+        if ts is None:
+            ts = self._fmt_ts()
+        return f"{kind} {ts}  {self._normalize_log_path(filepath)}"
 
     def _append_play_begin(self, filepath: str) -> None:
-        ts = datetime.now().isoformat(sep=' ', timespec='seconds')
-        self._append_log_line(f"PLAY_BEGIN {ts}  {self._normalize_log_path(filepath)}")
+        self._append_log_line(self._play_line("PLAY_BEGIN", filepath))
 
     def _append_play_event(self, filepath: str) -> None:
         """Append a single successful play event so the log updates as looping continues."""
-        ts = datetime.now().isoformat(sep=' ', timespec='seconds')
-        self._append_log_line(f"PLAY {ts}  {self._normalize_log_path(filepath)}")
+        self._append_log_line(self._play_line("PLAY", filepath))
 
     def _append_play_fail(self, filepath: str, reason: str) -> None:
-        ts = datetime.now().isoformat(sep=' ', timespec='seconds')
+        ts = self._fmt_ts()
         self._append_log_line(f"PLAY_FAIL {ts}  {self._normalize_log_path(filepath)}  {reason}")
 
     def _append_schedule_event(self, event: str, schedule_index: int, start_dt: datetime, stop_dt: datetime, filepath: str) -> None:
-        ts = datetime.now().isoformat(sep=' ', timespec='seconds')
+        ts = self._fmt_ts()
         path = self._normalize_log_path(filepath)
         self._append_log_line(
             f"SCHEDULE_{event} {ts}  idx={schedule_index}  start={start_dt.isoformat(sep=' ', timespec='seconds')}  stop={stop_dt.isoformat(sep=' ', timespec='seconds')}  path={path}"
         )
 
-    def _wait_while_busy(self) -> None:
-        """Sleep-loop while pygame mixer is playing; can be interrupted by stop_flag."""
-        while pygame.mixer.music.get_busy() and not self.stop_flag:
-            time.sleep(0.1)
+    def _stopped(self, deadline: float = None) -> bool:
+        """Whether a stop was requested or `deadline` (a time.time() value) has passed."""
+        return self._stop_event.is_set() or (deadline is not None and time.time() >= deadline)
+
+    def _wait_while_busy(self, channel=None, deadline: float = None) -> None:
+        """Block while pygame music (or `channel`) is playing.
 
-    def _play_once_pygame(self, filepath: str) -> None:
-        """Play a file once using pygame (non-blocking start, blocking wait)."""
+        Returns early on the stop event or once `deadline` (a time.time() value)
+        is reached; stopping the sound is then up to the caller.
+        """
+        get_busy = channel.get_busy if channel is not None else pygame.mixer.music.get_busy
+        if self._music_end_event is None:
+            while get_busy():
+                timeout = 0.1 if deadline is None else min(0.1, deadline - time.time())
+                if timeout <= 0 or self._stop_event.wait(timeout):
+                    break
+            return
+
+        while not self._stop_event.is_set():
+            # A stop posts the wake event; the timeout keeps Ctrl+C responsive
+            # while blocked in SDL and lands the wakeup on the deadline.
+            timeout_ms = 1000
+            if deadline is not None:
+                timeout_ms = min(timeout_ms, int((deadline - time.time()) * 1000))
+                if timeout_ms <= 0:
+                    break
+            ev = pygame.event.wait(timeout_ms)
+            if ev.type == self._music_end_event:
+                break
+            if ev.type == pygame.NOEVENT and not get_busy():
+                break
+
+    def _play_once_pygame(self, filepath: str, deadline: float = None) -> None:
+        """Play a file once using pygame (non-blocking start, blocking wait until it ends or `deadline`)."""
         pygame.mixer.music.load(filepath)
+        if self._music_end_event is not None:
+            # Drop a stale end event left over from a stopped previous track.
+            pygame.event.clear(self._music_end_event)
         pygame.mixer.music.play()
-        self._wait_while_busy()
+        self._wait_while_busy(deadline=deadline)
 
-    def _log_play_success(self, filepath: str) -> None:
-        """Update counters and log immediately for a successful play start."""
-        self._increment_play_count(filepath)
-        self._append_play_event(filepath)
+    def _loop_with_music_queue(self, filepath: str) -> None:
+        """Loop one file by keeping its next iteration queued in SDL_mixer.
 
-    def play_file(self, filepath):
-        """Play a single audio file once (best-effort)."""
+        SDL_mixer switches to the queued copy itself, so iterations follow
+        each other without a gap. The gain is the gap only: music.queue()
+        still loads the file (Mix_LoadMUS) for every iteration, which can't
+        be avoided while each iteration needs its own end event. Each end
+        event marks one finished iteration and is where we log and re-queue.
+        Returns if the file can't be loaded or playback stops unexpectedly.
+        """
+        try:
+            pygame.mixer.music.load(filepath)
+        except pygame.error:
+            return
+        pygame.event.clear(self._music_end_event)
+        pygame.mixer.music.play()
         self._append_play_begin(filepath)
+        pygame.mixer.music.queue(filepath)
+
+        plays = 0
         try:
-            print(f"Playing: {filepath}")
-            self._play_once_pygame(filepath)
-            # If we reached here without exception, consider it a successful play.
-            self._log_play_success(filepath)
-        except pygame.error as e:
-            # Common on Windows with .m4a when SDL_mixer lacks AAC/M4A codec support.
-            if filepath.lower().endswith('.m4a'):
-                print(f"pygame could not decode M4A ({e}). Trying ffplay fallback...")
-                if self._play_with_ffplay(filepath, loop=False):
-                    self._log_play_success(filepath)
+            while not self._stop_event.is_set():
+                ev = pygame.event.wait(1000)
+                if self._stop_event.is_set():
+                    # Stopping the music posts an end event too; don't count it.
+                    break
+                if ev.type == self._music_end_event:
+                    self._log_play_success(filepath, filepath, count=False)
+                    plays += 1
+                    pygame.mixer.music.queue(filepath)
+                elif ev.type == pygame.NOEVENT and not pygame.mixer.music.get_busy():
+                    self._append_play_fail(filepath, "playback_stopped")
                     return
-                self._append_play_fail(filepath, f"m4a_decode_failed:{e}")
-                print("M4A playback failed.")
-                print("To enable M4A on Windows, install FFmpeg (ffplay) and ensure 'ffplay' is on PATH,")
-                print("or convert the file to .ogg/.wav.")
-                return
+        finally:
+            # Counted here once rather than per iteration; also runs on Ctrl+C.
+            if plays:
+                self._increment_play_count(filepath, plays)
+
+    def _play_once_sound(self, sound) -> None:
+        """Play a preloaded pygame Sound once on a free channel and wait for it to end."""
+        if self._music_end_event is not None:
+            pygame.event.clear(self._music_end_event)
+        channel = sound.play()
+        if channel is None:
+            raise pygame.error("no free mixer channel")
+        if self._music_end_event is not None:
+            channel.set_endevent(self._music_end_event)
+        self._wait_while_busy(channel)
+
+    def _start_preload(self, filepath: str) -> None:
+        """Decode the next small WAV/OGG/FLAC file in the background while the current one plays.
+
+        Sound objects hold fully decoded audio, so large files are left to
+        pygame.mixer.music streaming.
+        """
+        if filepath in self._preloads or self._extension(filepath) not in self._PRELOAD_FORMATS:
+            return
+        # A Sound holds the decoded PCM, so size the file by its length at the
+        # mixer's output format; OGG and FLAC expand many times over on decode.
+        duration = self._sniff_duration(filepath)
+        mixer = pygame.mixer.get_init()
+        if duration is None or mixer is None:
+            return
+        rate, bits, channels = mixer
+        if duration * rate * channels * (abs(bits) // 8) > self._PRELOAD_MAX_BYTES:
+            return
+
+        result = {}
+
+        def load():
+            try:
+                result['sound'] = pygame.mixer.Sound(filepath)
+            except Exception:
+                pass  # play_file falls back to pygame.mixer.music
+
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        self._preloads[filepath] = (thread, result)
+
+    def _take_preloaded(self, filepath: str):
+        """Return the preloaded Sound for `filepath`, or None if it wasn't preloaded."""
+        preload = self._preloads.pop(filepath, None)
+        if preload is None:
+            return None
+        thread, result = preload
+        thread.join()
+        return result.get('sound')
+
+    def _log_play_success(self, filepath: str, next_filepath: str = None, count: bool = True) -> None:
+        """Update counters and log immediately for a successful play.
+
+        When playback runs straight on into `next_filepath`, its PLAY_BEGIN is
+        logged in the same write. Loops that tally their own plays pass
+        `count=False` and add the total when they finish.
+        """
+        if count:
+            self._increment_play_count(filepath)
+        if next_filepath is None:
+            self._append_play_event(filepath)
+        else:
+            ts = self._fmt_ts()
+            self._append_log_lines((
+                self._play_line("PLAY", filepath, ts),
+                self._play_line("PLAY_BEGIN", next_filepath, ts),
+            ))
+
+    def play_file(self, entry):
+        """Play a single audio file once (best-effort).
+
+        `entry` is a `(path, is_m4a)` record as returned by `get_audio_files`;
+        an `is_m4a` of None means the file's content hasn't been checked yet.
+        """
+        filepath, is_m4a = entry
+        self._append_play_begin(filepath)
+        print(f"Playing: {filepath}")
+        if is_m4a is None:
+            # An MP4/AAC file with another extension would only fail in pygame
+            # after a full decoder init, so route it by content.
+            is_m4a = self._sniff_format(filepath) == 'm4a'
+        if is_m4a:
+            self._play_m4a(filepath)
+        else:
+            self._play_pygame(filepath)
+
+    def _play_pygame(self, filepath: str) -> None:
+        """Play a file once with pygame and log the outcome."""
+        try:
+            sound = self._take_preloaded(filepath)
+            if sound is not None:
+                self._play_once_sound(sound)
+            else:
+                self._play_once_pygame(filepath)
+        except pygame.error as e:
             self._append_play_fail(filepath, f"pygame_error:{e}")
             print(f"Error playing {filepath}: {e}")
-        except Exception as e:
+            return
+        except (FileNotFoundError, PermissionError) as e:
             self._append_play_fail(filepath, f"error:{e}")
             print(f"Error playing {filepath}: {e}")
+            return
+        if not self._stopped():
+            self._log_play_success(filepath)
 
-    def _play_one_iteration_with_logging(self, filepath: str, prefer_ffplay_process: bool = False) -> None:
+    def _play_m4a(self, filepath: str) -> None:
+        """Play an .m4a file once with ffplay, falling back to pygame if ffplay is unavailable."""
+        # SDL_mixer often lacks an AAC/M4A decoder (notably on Windows), so go to
+        # ffplay first instead of waiting for pygame to fail.
+        if self._play_with_ffplay(filepath):
+            if not self._stopped():
+                self._log_play_success(filepath)
+            return
+
+        try:
+            self._play_once_pygame(filepath)
+        except pygame.error as e:
+            self._append_play_fail(filepath, f"m4a_decode_failed:{e}")
+            print("M4A playback failed.")
+            print("To enable M4A on Windows, install FFmpeg (ffplay) and ensure 'ffplay' is on PATH,")
+            print("or convert the file to .ogg/.wav.")
+            return
+        except (FileNotFoundError, PermissionError) as e:
+            self._append_play_fail(filepath, f"error:{e}")
+            print(f"Error playing {filepath}: {e}")
+            return
+        if not self._stopped():
+            self._log_play_success(filepath)
+
+    def _play_one_iteration_with_logging(self, filepath: str, is_m4a: bool = None,
+                                         deadline: float = None) -> None:
         """Play one iteration of a track, logging begin/success/fail.
 
         Used by both `--loop` and scheduled playback so behavior stays consistent.
+        Looping callers pass `is_m4a` so it isn't recomputed every iteration.
+        Scheduled playback passes its window's end as `deadline` (a time.time()
+        value); an iteration cut short by it is not counted as a play.
         """
         self._append_play_begin(filepath)
 
+        if is_m4a is None:
+            is_m4a = self._extension(filepath) == '.m4a' or self._sniff_format(filepath) == 'm4a'
+
         # `.m4a` may require ffplay fallback.
-        if filepath.lower().endswith('.m4a'):
-            if prefer_ffplay_process:
-                ok = self._play_with_ffplay_process(filepath)
-            else:
-                ok = self._play_with_ffplay(filepath, loop=False)
+        if is_m4a:
+            ok = self._play_with_ffplay(filepath, deadline=deadline)
 
             if ok:
-                if not self.stop_flag:
+                if not self._stopped(deadline):
                     self._log_play_success(filepath)
                 return
 
             # ffplay not available or failed => last-resort pygame attempt.
             self._append_play_fail(filepath, "ffplay_failed_or_not_available")
             try:
-                self._play_once_pygame(filepath)
-                if not self.stop_flag:
+                self._play_once_pygame(filepath, deadline)
+                if not self._stopped(deadline):
                     self._log_play_success(filepath)
             except Exception as e:
                 self._append_play_fail(filepath, f"pygame_m4a_failed:{e}")
@@ -227,64 +957,133 @@ class AudioPlayer:
 
         # Non-m4a: use pygame
         try:
-            self._play_once_pygame(filepath)
-            if not self.stop_flag:
+            self._play_once_pygame(filepath, deadline)
+            if not self._stopped(deadline):
                 self._log_play_success(filepath)
         except Exception as e:
             self._append_play_fail(filepath, f"play_failed:{e}")
 
+    def _play_files(self, audio_files) -> None:
+        """Play `(path, is_m4a)` records in order as they arrive.
+
+        Consecutive .m4a files with the same stream layout are batched through
+        one ffplay process, up to _QUEUE_MAX_FILES at a time, and the next
+        pygame-playable file is preloaded while the current one plays.
+        """
+        records = iter(audio_files)
+        entry = next(records, None)
+        while entry is not None and not self._stop_event.is_set():
+            if entry[1]:
+                run = [entry]
+                entry = next(records, None)
+                while entry is not None and entry[1] and len(run) < self._QUEUE_MAX_FILES:
+                    run.append(entry)
+                    entry = next(records, None)
+                # Only files with a matching codec, channel count and rate can
+                # share a concat run; the rest are played one by one.
+                for _, group in groupby(run, key=lambda e: self._m4a_info(e[0])[1]):
+                    if self._stop_event.is_set():
+                        return
+                    group = list(group)
+                    if len(group) > 1:
+                        unplayed = self._play_queue_with_ffplay([path for path, _ in group])
+                        group = group[len(group) - len(unplayed):]
+                    for m4a_entry in group:
+                        if self._stop_event.is_set():
+                            return
+                        self.play_file(m4a_entry)
+            else:
+                following = next(records, None)
+                if following is not None and not following[1]:
+                    self._start_preload(following[0])
+                self.play_file(entry)
+                entry = following
+
     def play(self, path, loop=False, loop_all=False):
         """
         Play audio files from the given path.
 
+        Directories are played while they are still being enumerated, so the
+        first track starts without waiting for the whole tree to be walked.
+
         Args:
             path: File or directory path
             loop: Loop a single file indefinitely
             loop_all: Loop all files indefinitely
         """
-        audio_files = self.get_audio_files(path)
+        if os.path.isdir(path):
+            records = self._iter_audio(path)
+        else:
+            records = iter(self.get_audio_files(path))
 
-        if not audio_files:
+        # Two records are enough to validate --loop without walking the whole tree.
+        head = list(islice(records, 2))
+        if not head:
             print("No audio files found.")
             return
 
-        print(f"Found {len(audio_files)} audio file(s)")
-
         # Validate loop usage
-        if loop and len(audio_files) > 1:
+        if loop and len(head) > 1:
             print("Error: --loop can only be used with a single audio file.")
             print("Use --loop-all to loop multiple files.")
             return
 
+        audio_files = chain(head, records)
+        # Drop a stop_flag left over from an earlier call.
+        self._stop_event.clear()
+
         # Handle single file looping
-        if len(audio_files) == 1 and loop:
-            target = audio_files[0]
+        if loop:
+            target, is_m4a = head[0]
+            is_m4a = is_m4a or self._sniff_format(target) == 'm4a'
             print(f"Looping: {target}")
             print("Press Ctrl+C to stop")
             try:
+                # Both only return if they can't be used for this file.
+                if is_m4a:
+                    # One ffplay process loops for the whole session.
+                    self._play_queue_with_ffplay([target], loop=True)
+                elif self._music_end_event is not None:
+                    self._loop_with_music_queue(target)
                 # Loop by replaying one iteration at a time so we can log each iteration.
-                while True:
-                    self.stop_flag = False
-                    self._play_one_iteration_with_logging(target, prefer_ffplay_process=False)
+                while not self._stop_event.is_set():
+                    self._play_one_iteration_with_logging(target, is_m4a=is_m4a)
             except KeyboardInterrupt:
                 print("\nStopped by user")
-                self.stop_flag = True
                 pygame.mixer.music.stop()
         # Handle all files looping
         elif loop_all:
             print("Looping all files")
             print("Press Ctrl+C to stop")
             try:
-                while True:
-                    for audio_file in audio_files:
-                        self.play_file(audio_file)
+                # Stream the first pass and keep its records so later passes
+                # don't walk the filesystem again.
+                seen = []
+
+                def first_pass():
+                    for filepath, is_m4a in audio_files:
+                        if is_m4a is None:
+                            # Settle the player choice once, not on every pass.
+                            is_m4a = self._sniff_format(filepath) == 'm4a'
+                        entry = (filepath, is_m4a)
+                        seen.append(entry)
+                        yield entry
+
+                self._play_files(first_pass())
+                if all(is_m4a for _, is_m4a in seen):
+                    # Keep one looping ffplay for the rest of the session; this
+                    # returns at once unless every file has the same stream
+                    # layout, and otherwise only if ffplay fails.
+                    self._play_queue_with_ffplay([path for path, _ in seen], loop=True)
+                while not self._stop_event.is_set():
+                    self._play_files(seen)
             except KeyboardInterrupt:
                 print("\nStopped by user")
                 pygame.mixer.music.stop()
+                pygame.mixer.stop()
         # Play all files once
         else:
-            for audio_file in audio_files:
-                self.play_file(audio_file)
+            self._play_files(audio_files)
             print("Playback finished")
 
     def _parse_schedule_time(self, value: str) -> datetime:
@@ -306,16 +1105,65 @@ class AudioPlayer:
             except Exception:
                 pass
 
-    def _play_loop_until_stop(self, filepath: str) -> None:
-        """Scheduled playback worker: loop until stop_flag is set."""
-        while not self.stop_flag:
-            self._play_one_iteration_with_logging(filepath, prefer_ffplay_process=True)
+    def _sleep_until(self, deadline: datetime) -> None:
+        """Sleep until a wall-clock deadline in as few wakeups as possible."""
+        # Convert the local deadline to an epoch timestamp once; comparing
+        # against time.time() is cheap and unaffected by DST transitions.
+        wake_at = deadline.timestamp()
+        while True:
+            remaining = wake_at - time.time()
+            if remaining <= 0:
+                return
+            # Re-check at least once a minute so clock steps (NTP, suspend)
+            # don't leave us sleeping past the deadline.
+            time.sleep(min(remaining, 60.0))
+
+    def close(self) -> None:
+        """Stop any external player process that is still running and close the play log."""
+        self._stop_external_players()
+        self._stop_log_writer()
+        if self._log_fd is not None:
+            try:
+                os.close(self._log_fd)
+            except OSError as e:
+                print(f"Warning: failed to close play log '{self.log_file}': {e}")
+            self._log_fd = None
+
+    def _play_until(self, filepath: str, deadline: float) -> None:
+        """Scheduled playback: loop `filepath` until `deadline` (a time.time() value) or a stop."""
+        reported_missing = False
+        is_m4a = None
+        while not self._stopped(deadline):
+            if not os.path.isfile(filepath):
+                if not reported_missing:
+                    print(f"Scheduled path not ready yet: {filepath}")
+                    self._append_play_fail(filepath, "path_not_ready")
+                    reported_missing = True
+                # Retry until the file appears, the window ends or stop_flag is set.
+                self._stop_event.wait(max(0.0, min(self._SCHEDULE_RETRY_S, deadline - time.time())))
+                continue
+            if is_m4a is None:
+                # Decide once the file exists (sniffing needs its header), not per iteration.
+                is_m4a = self._extension(filepath) == '.m4a' or self._sniff_format(filepath) == 'm4a'
+                if is_m4a:
+                    # One 'ffplay -loop 0' for the whole window instead of a process
+                    # per iteration. Returns at the deadline, or early if ffplay is
+                    # missing or fails, leaving the rest to the per-iteration loop.
+                    self._play_queue_with_ffplay([filepath], loop=True, deadline=deadline)
+                    continue
+            self._play_one_iteration_with_logging(filepath, is_m4a=is_m4a, deadline=deadline)
 
     def play_scheduled(self, schedule_file: str) -> None:
         """Play audio according to a JSON schedule file."""
         try:
-            with open(schedule_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            # orjson (optional) parses large schedules several times faster.
+            from orjson import loads
+        except ImportError:
+            from json import loads
+
+        try:
+            with open(schedule_file, 'rb') as f:
+                data = loads(f.read())
         except Exception as e:
             print(f"Error: Failed to read schedule file '{schedule_file}': {e}")
             return
@@ -325,14 +1173,9 @@ class AudioPlayer:
             print("Error: schedule file must contain a non-empty 'schedules' array")
             return
 
-        # Sort by start_time
-        def _start_dt(item):
-            return self._parse_schedule_time(item['start_time'])
-
-        schedules = sorted(schedules, key=_start_dt)
-
-        print(f"Loaded {len(schedules)} schedule(s)")
-
+        # Validate and parse every entry once up front; the playback loop below
+        # only reads the cached datetimes and resolved path.
+        parsed = []
         for idx, item in enumerate(schedules, start=1):
             for key in ('start_time', 'stop_time', 'path'):
                 if key not in item:
@@ -350,14 +1193,28 @@ class AudioPlayer:
                 print(f"Error: schedule #{idx} stop_time must be after start_time")
                 return
 
+            # Existence is checked when the window starts: the file may be
+            # copied or its drive mounted after the schedule is loaded.
             audio_path = self._resolve_schedule_path(schedule_file, item['path'])
-            if not os.path.exists(audio_path):
-                print(f"Error: schedule #{idx} audio path does not exist: {audio_path}")
-                return
             if not self.is_audio_file(audio_path):
                 print(f"Error: schedule #{idx} unsupported audio file type: {audio_path}")
                 return
 
+            # Keep the position in the file so messages and log lines number
+            # entries the same way the validation errors above do.
+            parsed.append(dict(item, _index=idx, _start_dt=start_dt, _stop_dt=stop_dt, _audio_path=audio_path))
+
+        # Sort by start_time
+        schedules = sorted(parsed, key=itemgetter('_start_dt'))
+
+        print(f"Loaded {len(schedules)} schedule(s)")
+
+        for item in schedules:
+            idx = item['_index']
+            start_dt = item['_start_dt']
+            stop_dt = item['_stop_dt']
+            audio_path = item['_audio_path']
+
             # Log schedule metadata before waiting/starting
             self._append_schedule_event('ENTRY', idx, start_dt, stop_dt, audio_path)
 
@@ -365,37 +1222,27 @@ class AudioPlayer:
             if now < start_dt:
                 wait_s = int((start_dt - now).total_seconds())
                 print(f"Schedule #{idx}: waiting {wait_s}s until {start_dt} to start {audio_path}")
-                while datetime.now() < start_dt:
-                    time.sleep(0.5)
+                self._sleep_until(start_dt)
             else:
                 print(f"Schedule #{idx}: start_time already passed ({start_dt}); starting immediately")
 
             print(f"Schedule #{idx}: playing until {stop_dt}")
             self._append_schedule_event('START', idx, start_dt, stop_dt, audio_path)
 
-            self.stop_flag = False
-            self.playback_thread = threading.Thread(
-                target=self._play_loop_until_stop,
-                args=(audio_path,),
-                daemon=True,
-            )
-            self.playback_thread.start()
-
+            # Play in this thread; every wait inside is bounded by the window's end.
+            # A stop_flag request only ends the window it lands in.
+            self._stop_event.clear()
             try:
-                while datetime.now() < stop_dt:
-                    time.sleep(0.2)
+                self._play_until(audio_path, stop_dt.timestamp())
             except KeyboardInterrupt:
                 print("\nStopped by user")
 
-            # Stop playback and wait for thread exit
-            self.stop_flag = True
+            # Stop whatever is still sounding at the end of the window
+            self._stop_external_players()
             try:
                 pygame.mixer.music.stop()
             except Exception:
                 pass
-            self._stop_external_players()
-            if self.playback_thread:
-                self.playback_thread.join(timeout=5)
 
             self._append_schedule_event('STOP', idx, start_dt, stop_dt, audio_path)
 
@@ -417,20 +1264,21 @@ class AudioPlayer:
         if not self.play_counts:
             lines.append("  (no plays)")
         else:
-            for path, count in self.play_counts.most_common():
-                lines.append(f"  {count}  {path}")
-
-        lines.append("")
+            items = self.play_counts.items()
+            if len(self.play_counts) > 1:
+                items = sorted(items, key=lambda kv: -kv[1])
+            lines.extend(f"  {count}  {path}" for path, count in items)
 
-        self._write_run_log_header_if_needed()
-        try:
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                f.write("\n".join(lines))
-        except Exception as e:
-            print(f"Warning: failed to write play log '{self.log_file}': {e}")
+        # One entry for the whole summary (with the run header if nothing else
+        # was logged), so it reaches the file in a single write.
+        self._queue_log_entry("\n".join(lines) + "\n")
+        self._stop_log_writer()
 
 def main():
     """Main entry point for the audio player."""
+    # Only the command line needs argparse; importing AudioPlayer doesn't pay for it.
+    import argparse
+
     parser = argparse.ArgumentParser(
         description='Simple Python Audio Player - Play audio files from file or directory path',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -473,6 +1321,19 @@ Examples:
         help='Path to JSON file containing schedule for playing audio files at specific times'
     )
 
+    parser.add_argument(
+        '--mixer-freq',
+        type=int,
+        help='Mixer output rate in Hz (default: the rate of a single WAV/FLAC file, otherwise 44100)'
+    )
+
+    parser.add_argument(
+        '--mixer-buffer',
+        type=int,
+        default=1024,
+        help='Mixer buffer size in samples (default: 1024)'
+    )
+
     args = parser.parse_args()
     
     # Validate arguments
@@ -481,24 +1342,33 @@ Examples:
         parser.print_help()
         sys.exit(1)
     
+    # Check the inputs before creating the player, so a typo doesn't pay for
+    # loading pygame and opening the audio device.
+    if args.schedule:
+        if not os.path.exists(args.schedule):
+            print(f"Error: Schedule file '{args.schedule}' does not exist.")
+            sys.exit(1)
+    elif not os.path.exists(args.path):
+        print(f"Error: Path '{args.path}' does not exist.")
+        sys.exit(1)
+
+    mixer_freq = args.mixer_freq
+    if mixer_freq is None:
+        mixer_freq = 44100
+        if not args.schedule and os.path.isfile(args.path):
+            mixer_freq = AudioPlayer._sniff_sample_rate(args.path) or mixer_freq
+
     # Create player
-    player = AudioPlayer(log_file=args.log_file)
+    player = AudioPlayer(log_file=args.log_file, mixer_freq=mixer_freq, mixer_buffer=args.mixer_buffer)
     
     try:
-        # Handle scheduled mode
         if args.schedule:
-            if not os.path.exists(args.schedule):
-                print(f"Error: Schedule file '{args.schedule}' does not exist.")
-                sys.exit(1)
             player.play_scheduled(args.schedule)
         else:
-            # Validate path for regular play mode
-            if not os.path.exists(args.path):
-                print(f"Error: Path '{args.path}' does not exist.")
-                sys.exit(1)
             player.play(args.path, loop=args.loop, loop_all=args.loop_all)
     finally:
         player.write_run_log()
+        player.close()
 
 
 if __name__ == '__main__':